@@ -0,0 +1,93 @@
+"""Compare the room-state codecs on a full round-3 room.
+
+Encodes and decodes every value the way the room is stored in Redis (one value per scalar field,
+per player and per item) and reports the time per full room and the total stored size, plus the
+size of the same room as a single blob for reference. Also prints the size of the game_state
+snapshot a client is sent for the room in each wire protocol version.
+
+    pip install msgpack
+    python bench_codec.py [--players 5] [--pizzas 30] [--repeat 200]
+
+Imports main for the real codec and room builders. That import does the server's startup work: it
+needs Redis at REDIS_URL (local by default) and the database, creates the tables, copies the old
+high scores if score_history is empty and starts the background loops, which may get as far as
+scheduling the sweep before shutdown_flag stops them. Point REDIS_URL at a Redis of its own rather
+than a shared one. No socket server is started.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+import main
+main.shutdown_flag = True  # only the codec and room builders are wanted, not the server's loops
+
+def round3_room(players, pizzas):
+    state = main.new_game_state("bench")
+    state.update(round=3, current_phase="round", round_start_time=time.time() - 150)
+    now = time.time()
+    for i in range(players):
+        sid = uuid.uuid4().hex[:20]
+        state["players"][sid] = {"builder_ingredients": [{"id": uuid.uuid4().hex[:8], "type": t, "prepared_by": sid, "prepared_at": now - 10}
+                                                         for t in ("base", "sauce", "ham", "ham")], "joined_at": now - 400}
+    for i in range(12):
+        state["prepared_ingredients"].append({"id": uuid.uuid4().hex[:8], "type": random.choice(["base", "sauce", "ham", "pineapple"]),
+                                              "prepared_by": sid, "prepared_at": now - i})
+    orders = main.generate_customer_orders(state["round_duration"])
+    state["customer_orders"], state["pending_orders"] = orders[:8], orders[8:]
+
+    for i in range(pizzas):
+        order = orders[i % len(orders)]
+        pizza = {"pizza_id": uuid.uuid4().hex[:8], "built_at": now - 100 + i, "baking_time": 38.5,
+                 "ingredients": dict(order["ingredients"]), "build_start_time": now - 120 + i, "type": order["type"], "order_id": order["id"]}
+        if i % 3 == 0:
+            state["built_pizzas"].append(pizza)
+        else:
+            pizza.update(oven_start=now - 60 + i, completed_at=now - 20 + i, status="cooked" if i % 3 == 1 else "burnt")
+            state["completed_pizzas" if i % 3 == 1 else "wasted_pizzas"].append(pizza)
+            state["lead_times"].append({"pizza_id": pizza["pizza_id"], "lead_time": 100.0 + i, "status": "completed", "start_time": pizza["build_start_time"]})
+    return state
+
+def stored_values(state):
+    """Every value as the room is laid out in Redis."""
+    values = [v for k, v in state.items() if k not in main.ROOM_COLLECTIONS]
+    for field in main.ROOM_COLLECTIONS:
+        values += list(state[field].values()) if field == "players" else state[field]
+    return values
+
+def bench(codec, state, repeat):
+    main.STATE_CODEC = codec
+    values = stored_values(state)
+    start = time.perf_counter()
+    for _ in range(repeat): encoded = [main.encode(v) for v in values]
+    encode_s = (time.perf_counter() - start) / repeat
+    raw = [e.encode() if isinstance(e, str) else e for e in encoded]
+    start = time.perf_counter()
+    for _ in range(repeat): decoded = [main.decode(e) for e in raw]
+    decode_s = (time.perf_counter() - start) / repeat
+    assert decoded == json.loads(json.dumps(values)), codec
+    blob = main.encode(state)
+    return {"encode_us": encode_s * 1e6, "decode_us": decode_s * 1e6, "stored_bytes": sum(map(len, raw)),
+            "blob_bytes": len(blob.encode() if isinstance(blob, str) else blob)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--players", type=int, default=5)
+    parser.add_argument("--pizzas", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    state = round3_room(args.players, args.pizzas)
+    codecs = ["json"] + (["msgpack"] if main.msgpack else [])
+    print(f"{'codec':<10}{'encode us':>12}{'decode us':>12}{'stored B':>12}{'blob B':>10}")
+    for codec in codecs:
+        res = bench(codec, state, args.repeat)
+        print(f"{codec:<10}{res['encode_us']:>12.0f}{res['decode_us']:>12.0f}{res['stored_bytes']:>12}{res['blob_bytes']:>10}")
+    if not main.msgpack: print("(pip install msgpack to compare MessagePack)")
+
+    print(f"\n{'protocol':<10}{'game_state B':>14}")
+    for protocol in range(1, main.PROTOCOL + 1):
+        for player in state["players"].values(): player["protocol"] = protocol
+        snapshot = main.sanitize_game_state_for_emit(state)
+        print(f"{protocol:<10}{len(json.dumps(snapshot, separators=(',', ':'), ensure_ascii=False).encode()):>14}")
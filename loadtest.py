@@ -0,0 +1,325 @@
+"""Load test for the Kanban Pizza socket server.
+
+Simulated players join rooms and play rounds as fast as the server confirms their actions:
+prepare -> take -> build -> move to oven, with each room's first player running the oven, while
+every client also sends the 1 s time_request. Reports event-to-broadcast latency (p50/p95/p99)
+per action, messages and bytes received per second and Redis commands per action. Results can
+be saved as JSON and compared with an earlier run.
+
+    pip install "python-socketio[client]"
+    python loadtest.py --spawn --rooms 4 --players 5 --duration 60 --out before.json
+    python loadtest.py --spawn --rooms 4 --players 5 --duration 60 --compare before.json
+
+--spawn starts main.py itself against REDIS_URL (local Redis by default) and SQLite; without it,
+point --url at a running server. --idle-rooms N adds N rooms, each with one idle player, to the
+registry for the run (written with main.py's own storage code). --idle-check N compares per-event
+latency with and without many rooms on the server: it runs the load twice, without and with N idle
+rooms, and exits non-zero if the p95 of the game actions grows by more than --max-slowdown percent.
+It is a manual check, run against a live server and Redis; nothing runs it automatically:
+
+    python loadtest.py --spawn --rooms 4 --players 5 --idle-check 1000
+
+A server that isn't spawned needs MAX_ROOMS above --rooms plus --idle-rooms. Redis commands are read from INFO commandstats, so they include
+everything the server (and anything else on that Redis) did during the run.
+"""
+import argparse
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import redis
+import socketio
+
+RECIPE = ["base", "sauce", "ham", "ham", "ham", "ham"]
+
+# Run in a child process: main.py patches the interpreter with eventlet when imported
+IDLE_ROOMS = """
+import os, sys, time
+import main
+main.shutdown_flag = True  # only the storage helpers are wanted, not the server's loops
+prefix, count, action = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+for i in range(count):
+    room = f"{prefix}-{i}"
+    if action == "drop":
+        main.delete_room(room)
+        continue
+    state = main.new_game_state("loadtest")
+    state["players"]["idle"] = {"builder_ingredients": [], "joined_at": time.time()}
+    main.save_game_state(room, state)
+os._exit(0)  # skip eventlet's teardown
+"""
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latencies, self.timeouts = {}, {}
+            self.sent = self.received = self.bytes = 0
+
+    def on_sent(self):
+        with self.lock: self.sent += 1
+
+    def on_received(self, data):
+        size = len(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()) if data is not None else 0
+        with self.lock:
+            self.received += 1
+            self.bytes += size
+
+    def on_reply(self, action, seconds):
+        with self.lock: self.latencies.setdefault(action, []).append(seconds)
+
+    def on_timeout(self, action):
+        with self.lock: self.timeouts[action] = self.timeouts.get(action, 0) + 1
+
+class Player:
+    """One socket.io client. Actions are sent one at a time, each waiting for the broadcast that
+    confirms it; the time_request loop has its own slot so it runs alongside."""
+
+    def __init__(self, url, room, leader, stats, bake):
+        self.room, self.leader, self.stats, self.bake = room, leader, stats, bake
+        self.phase = None
+        self.waiting = {}  # slot -> (match, threading.Event, reply box)
+        self.lock = threading.Lock()
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('*', self.on_event)
+        self.client.connect(url, transports=['websocket'], auth={"protocol": 2})
+        self.sid = self.client.get_sid()
+
+    def on_event(self, event, data=None):
+        now = time.perf_counter()
+        self.stats.on_received(data)
+        # Events the server coalesced into one broadcast window arrive together
+        for name, payload in (data["events"] if event == "batched_events" else [(event, data)]):
+            self.handle(name, payload, now)
+
+    def handle(self, event, data, now):
+        if event == "game_state": self.phase = data["current_phase"]
+        elif event == "round_started": self.phase = "round"
+        elif event == "round_ended": self.phase = "debrief"
+        elif event == "game_reset": self.phase = "waiting"
+        with self.lock:
+            for slot, (match, done, box) in list(self.waiting.items()):
+                if match(event, data):
+                    box.update(event=event, data=data, at=now)
+                    del self.waiting[slot]
+                    done.set()
+
+    def call(self, action, payload, match, slot="action", timeout=5):
+        """Emit an action and wait for the event that confirms it. Returns {event, data, at} or None."""
+        done, box = threading.Event(), {}
+        with self.lock: self.waiting[slot] = (match, done, box)
+        sent = time.perf_counter()
+        self.client.emit(action, payload)
+        self.stats.on_sent()
+        if not done.wait(timeout):
+            with self.lock: self.waiting.pop(slot, None)
+            self.stats.on_timeout(action)
+            return None
+        self.stats.on_reply(action, box["at"] - sent)
+        return box
+
+    def join(self, password):
+        reply = self.call("join", {"room": self.room, "password": password}, lambda e, d: e in ("game_state", "join_error"))
+        if not reply or reply["event"] != "game_state":
+            raise SystemExit(f"{self.room}: could not join ({reply and reply['data']})")
+
+    def play(self, stop):
+        while not stop.is_set():
+            if self.phase == "round":
+                self.build_pizza()
+            elif self.leader and self.phase == "waiting":
+                self.call("start_round", {}, lambda e, d: e == "round_started")
+            else:
+                time.sleep(0.2)
+
+    def build_pizza(self):
+        prepared = []
+        for kind in RECIPE:
+            reply = self.call("prepare_ingredient", {"ingredient_type": kind}, lambda e, d: e == "ingredient_prepared" and d["prepared_by"] == self.sid)
+            if not reply: return
+            prepared.append(reply["data"])
+        for item in prepared:
+            if not self.call("take_ingredient", {"ingredient_id": item["id"]}, lambda e, d, iid=item["id"]: e == "ingredient_removed" and d["ingredient_id"] == iid): return
+
+        start = min(i["prepared_at"] for i in prepared)
+        reply = self.call("build_pizza", {}, lambda e, d: (e == "pizza_built" and d["build_start_time"] == start) or e == "build_error")
+        if not reply or reply["event"] != "pizza_built": return
+        pid = reply["data"]["pizza_id"]
+        reply = self.call("move_to_oven", {"pizza_id": pid}, lambda e, d: (e == "pizza_moved_to_oven" and d["pizza_id"] == pid) or e == "oven_error")
+
+        # The oven is shared, so only the room's first player switches it
+        if self.leader and reply and reply["event"] == "pizza_moved_to_oven":
+            self.call("toggle_oven", {"state": "on"}, lambda e, d: e == "oven_toggled" and d["state"] == "on")
+            time.sleep(self.bake)
+            self.call("toggle_oven", {"state": "off"}, lambda e, d: e == "oven_toggled" and d["state"] == "off")
+
+    def poll_time(self, stop):
+        # The room clock pushes time_response every second too, so the reply is matched on its echoed id
+        for n in itertools.count():
+            if stop.wait(1): return
+            self.call("time_request", {"id": n}, lambda e, d, n=n: e == "time_response" and d.get("id") == n, slot="clock", timeout=2)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def redis_calls(rd):
+    try:
+        return sum(v["calls"] for v in rd.info("commandstats").values())
+    except redis.RedisError:
+        return None
+
+def summarize(stats, elapsed, calls):
+    def row(values):
+        return {"count": len(values), "p50_ms": percentile(values, 50) * 1000, "p95_ms": percentile(values, 95) * 1000, "p99_ms": percentile(values, 99) * 1000}
+
+    actions = {name: row(values) for name, values in sorted(stats.latencies.items())}
+    game = [v for name, values in stats.latencies.items() if name != "time_request" for v in values]
+    return {
+        "elapsed_s": elapsed,
+        "actions": actions,
+        "overall": row(game) if game else None,
+        "timeouts": stats.timeouts,
+        "sent": stats.sent,
+        "messages_per_s": stats.received / elapsed,
+        "bytes_per_s": stats.bytes / elapsed,
+        "redis_commands": calls,
+        "redis_commands_per_action": calls / stats.sent if calls is not None and stats.sent else None,
+    }
+
+def report(results):
+    print(f"{'action':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = dict(results["actions"])
+    if results["overall"]: rows["(all but time)"] = results["overall"]
+    for name, row in rows.items():
+        print(f"{name:<20}{row['count']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    if results["timeouts"]: print("timeouts:", results["timeouts"])
+    print(f"received {results['messages_per_s']:.0f} msg/s, {results['bytes_per_s'] / 1024:.1f} KiB/s; sent {results['sent']} actions")
+    if results["redis_commands"] is not None:
+        print(f"redis: {results['redis_commands']} commands, {results['redis_commands_per_action']:.1f} per action")
+
+def compare(results, baseline):
+    def metrics(res):
+        out = {"messages_per_s": res["messages_per_s"], "bytes_per_s": res["bytes_per_s"], "redis_commands_per_action": res["redis_commands_per_action"]}
+        for name, row in dict(res["actions"], overall=res["overall"] or {}).items():
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if key in row: out[f"{name}.{key}"] = row[key]
+        return out
+
+    old, new = metrics(baseline["results"]), metrics(results)
+    print(f"\nvs {baseline.get('git', '?')} ({baseline['config']})")
+    for key in new:
+        if old.get(key) is None or new[key] is None: continue
+        change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0
+        print(f"  {key:<32}{old[key]:>12.1f} -> {new[key]:>12.1f}  ({change:+.0f}%)")
+
+def idle_rooms(redis_url, prefix, count, action):
+    env = dict(os.environ, REDIS_URL=redis_url)
+    env.pop("dbpass", None)
+    subprocess.run([sys.executable, "-c", IDLE_ROOMS, prefix, str(count), action], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True)
+
+def spawn_server(url, redis_url, max_rooms):
+    env = dict(os.environ, REDIS_URL=redis_url, MAX_ROOMS=str(max_rooms))
+    env.pop("dbpass", None)  # SQLite
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    target = urlparse(url)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection((target.hostname, target.port or 80), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("server did not start")
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_load(args, idle):
+    run = int(time.time())
+    if idle: idle_rooms(args.redis, f"idle-{run}", idle, "seed")
+    # The default limit on top, for rooms other runs left behind
+    server = spawn_server(args.url, args.redis, 10 + args.rooms + idle) if args.spawn else None
+    stats, stop, players = Stats(), threading.Event(), []
+    try:
+        for i in range(args.rooms):
+            for j in range(args.players):
+                player = Player(args.url, f"loadtest-{run}-{i}", j == 0, stats, args.bake)
+                player.join("loadtest")
+                players.append(player)
+
+        rd = redis.from_url(args.redis)
+        threads = [threading.Thread(target=p.play, args=(stop,)) for p in players]
+        threads += [threading.Thread(target=p.poll_time, args=(stop,)) for p in players]
+        stats.reset()
+        calls = redis_calls(rd)
+        started = time.perf_counter()
+        for t in threads: t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads: t.join()
+        elapsed = time.perf_counter() - started
+        after = redis_calls(rd)
+        return summarize(stats, elapsed, after - calls if calls is not None and after is not None else None)
+    finally:
+        stop.set()
+        for p in players: p.client.disconnect()
+        if server:
+            server.terminate()
+            server.wait()
+        if idle: idle_rooms(args.redis, f"idle-{run}", idle, "drop")
+
+def idle_check(args):
+    """Run the load without and with --idle-check rooms; True if the p95 stays within --max-slowdown."""
+    base = run_load(args, 0)
+    loaded = run_load(args, args.idle_check)
+    print("without idle rooms:"); report(base)
+    print(f"\nwith {args.idle_check} idle rooms:"); report(loaded)
+    if not base["overall"] or not loaded["overall"]: raise SystemExit("no game actions completed")
+    # A couple of milliseconds of slack, so a fast baseline doesn't fail on scheduling noise
+    limit = base["overall"]["p95_ms"] * (1 + args.max_slowdown / 100) + 2
+    ok = loaded["overall"]["p95_ms"] <= limit
+    print(f"\np95 {base['overall']['p95_ms']:.1f} ms -> {loaded['overall']['p95_ms']:.1f} ms (limit {limit:.1f} ms): {'ok' if ok else 'FAILED'}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--redis", default=os.environ.get("REDIS_URL", "redis://localhost:6379"))
+    parser.add_argument("--rooms", type=int, default=2, help="the server allows MAX_ROOMS (10 by default)")
+    parser.add_argument("--players", type=int, default=3, help="per room; the server allows MAX_PLAYERS (5 by default)")
+    parser.add_argument("--idle-rooms", type=int, default=0, help="extra rooms with an idle player each, held for the run")
+    parser.add_argument("--idle-check", type=int, default=0, help="run without and with this many idle rooms and compare")
+    parser.add_argument("--max-slowdown", type=float, default=25, help="p95 growth in percent that fails --idle-check")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to measure for")
+    parser.add_argument("--bake", type=float, default=0.5, help="seconds the leader keeps the oven on")
+    parser.add_argument("--spawn", action="store_true", help="start main.py for the run")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="print the change against an earlier --out file")
+    args = parser.parse_args()
+
+    if args.idle_check: sys.exit(0 if idle_check(args) else 1)
+    config = {"rooms": args.rooms, "players": args.players, "idle_rooms": args.idle_rooms, "duration": args.duration, "bake": args.bake}
+    results = run_load(args, args.idle_rooms)
+    report(results)
+    if args.compare:
+        with open(args.compare) as f: compare(results, json.load(f))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"git": git_revision(), "at": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": config, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 /**
  * PIZZA GAME CLIENT - FINAL CORRECTED VERSION
- * Features: Howler Audio, SortableJS, Restored Timer Heartbeat.
+ * Features: Howler Audio, SortableJS, Server-driven Room Clock.
  * SAVE AS: /static/js/main.js
  */
 (function() {
@@ -14,6 +14,7 @@
             profanity: 'https://www.purgomalum.com/service/containsprofanity?text=',
             qr: 'https://api.qrserver.com/v1/create-qr-code/?size=100x100&margin=0&data='
         },
+        batchWindowMs: 80,  // quick clicks within this window go to the server as one batch_actions
         emojis: {
             ingredients: { "base": "🟡", "sauce": "🔴", "ham": "🥓", "pineapple": "🍍" },
             orders: {
@@ -92,18 +93,26 @@
        3. STATE MANAGEMENT
        ========================================= */
     const State = {
-        socket: io({ transports: ['websocket', 'polling'], reconnection: true }),
+        // protocol: the newest wire format this client reads (see Wire)
+        socket: io({ transports: ['websocket', 'polling'], reconnection: true, auth: { protocol: 2 } }),
         myRoom: localStorage.getItem('myRoom') || "",
         isInitialConnect: true,
         pendingQrRoom: null,
         builderIngredients: [],
         dashboardInterval: null,
+        dashboardPage: 0,
+        dashboardNext: null,
+        dashboardRooms: {},
+        dashboardClockOffset: 0,
+        pendingActions: [],
+        batchTimer: null,
         lastCFDData: null,
         lastLeadTimeData: null,
         gameData: {},
 
-        // Heartbeat interval for syncing time/logic
-        heartbeat: null
+        // Last applied game_state_patch sequence number (null until the first snapshot)
+        seq: null,
+        resyncing: false
     };
 
     /* =========================================
@@ -410,6 +419,87 @@
         }
     };
 
+    /* =========================================
+       6b. STATE PATCHES
+       ========================================= */
+    // Version 2 snapshots and patches send items compacted; expand them to the names used everywhere else
+    const Wire = {
+        keys: { i: "id", p: "pizza_id", t: "type", s: "status", g: "ingredients", o: "order_id", by: "prepared_by", pa: "prepared_at",
+                at: "arrival_time", ba: "built_at", bs: "build_start_time", bk: "baking_time", os: "oven_start", ca: "completed_at" },
+        ingredients: ["base", "sauce", "ham", "pineapple"],
+        codes: ["base", "sauce", "ham", "pineapple", "bacon", "ham & pineapple", "light ham", "light pineapple", "plain", "heavy ham", "heavy pineapple",
+                "invalid", "unmatched", "undercooked", "cooked", "burnt"],
+        collections: ["prepared_ingredients", "built_pizzas", "oven", "completed_pizzas", "wasted_pizzas", "customer_orders"],
+
+        // holder: the sid whose builder the item is on, which is who prepared it unless it says otherwise
+        item(compact, holder) {
+            const item = holder && !("by" in compact) ? { prepared_by: holder } : {};
+            Object.entries(compact).forEach(([k, v]) => {
+                const key = this.keys[k] || k;
+                if (key === "type" || key === "status") item[key] = typeof v === "number" ? this.codes[v] : v;
+                else if (key === "ingredients") item[key] = Object.fromEntries(this.ingredients.map((name, i) => [name, v[i]]));
+                else item[key] = v;
+            });
+            return item;
+        },
+
+        player(p, sid) {
+            return { ...p, builder_ingredients: p.builder_ingredients.map(i => this.item(i, sid)) };
+        },
+
+        state(state) {
+            if (state.v !== 2) return state;
+            this.collections.forEach(f => { if (state[f]) state[f] = state[f].map(x => this.item(x)); });
+            Object.keys(state.players).forEach(sid => { state.players[sid] = this.player(state.players[sid], sid); });
+            return state;
+        },
+
+        op(op) {
+            const field = op.path[0];
+            if ((op.op !== "set" && op.op !== "push") || (!this.collections.includes(field) && field !== "players")) return op;
+            const holder = field === "players" ? op.path[1] : undefined;
+            if (field === "players" && op.path.length === 2) return { ...op, value: this.player(op.value, holder) };
+            return { ...op, value: op.op === "push" ? this.item(op.value, holder) : op.value.map(x => this.item(x, holder)) };
+        }
+    };
+
+    const Patch = {
+        applyOp(state, op) {
+            const path = op.path.slice();
+            const key = path.pop();
+            let node = state;
+            path.forEach(k => { node = node[k]; });
+            if (op.op === "set") node[key] = op.value;
+            else if (op.op === "del") delete node[key];
+            else if (op.op === "push") node[key].push(op.value);
+            else if (op.op === "remove") node[key] = node[key].filter(x => (x.id || x.pizza_id) !== op.id);
+        },
+
+        apply(patch) {
+            if (State.seq === null || patch.seq <= State.seq) return; // no snapshot yet, or already applied
+            if (patch.seq !== State.seq + 1) return this.resync();
+            try {
+                const ops = patch.v === 2 ? patch.ops.map(op => Wire.op(op)) : patch.ops;
+                ops.forEach(op => this.applyOp(State.gameData, op));
+            } catch (e) {
+                return this.resync();
+            }
+            State.seq = patch.seq;
+            UI.refreshGameState(State.gameData);
+        },
+
+        resync() {
+            if (State.resyncing) return;
+            State.resyncing = true;
+            State.socket.emit('request_game_state');
+        },
+
+        snapshot(state) {
+            State.seq = state.seq ?? null;
+            State.resyncing = false;
+        }
+    };
+
     /* =========================================
        7. GAME ACTIONS
        ========================================= */
@@ -421,9 +511,24 @@
             State.socket.emit('join', { room: room, password: password });
         },
 
+        // Actions are queued briefly and sent together; flush() sends them now, in order
+        queueAction(action, data, flush = false) {
+            State.pendingActions.push({ action: action, data: data });
+            if (flush) return this.flushActions();
+            if (!State.batchTimer) State.batchTimer = setTimeout(() => this.flushActions(), CONFIG.batchWindowMs);
+        },
+
+        flushActions() {
+            clearTimeout(State.batchTimer);
+            State.batchTimer = null;
+            if (!State.pendingActions.length) return;
+            State.socket.emit('batch_actions', { actions: State.pendingActions });
+            State.pendingActions = [];
+        },
+
         handleDropToBuilder(ingredient_id, ingredient_type) {
             Audio.play('pop');
-            State.socket.emit('take_ingredient', { ingredient_id: ingredient_id });
+            this.queueAction('take_ingredient', { ingredient_id: ingredient_id });
             if (State.gameData.round === 1) {
                 State.builderIngredients.push({ id: ingredient_id, type: ingredient_type });
                 UI.updateBuilderDisplay();
@@ -432,7 +537,7 @@
 
         handleDropToShared(ingredient_id, sid) {
             Audio.play('pop');
-            State.socket.emit('take_ingredient', { ingredient_id: ingredient_id, target_sid: sid });
+            this.queueAction('take_ingredient', { ingredient_id: ingredient_id, target_sid: sid });
         },
 
         submitPizza() {
@@ -440,7 +545,7 @@
                 alert("No ingredients selected for pizza!");
                 return;
             }
-            State.socket.emit('build_pizza', {});
+            this.queueAction('build_pizza', {}, true);
             State.builderIngredients = [];
             UI.updateBuilderDisplay();
         },
@@ -474,6 +579,7 @@
 
 
         s.on('connect', () => {
+            if (State.dashboardInterval) s.emit('request_admin_dashboard', { page: State.dashboardPage }); // a new connection isn't in the admin room yet
             if (State.pendingQrRoom) return;
             if (State.isInitialConnect) {
                 new bootstrap.Modal(document.getElementById('roomModal'), { backdrop: 'static', keyboard: false }).show();
@@ -497,16 +603,18 @@
             const rooms = Object.keys(data.rooms);
             if (rooms.length === 0) tbody.innerHTML = '<tr><td colspan="3" class="text-center text-muted">No active rooms. Create one to start!</td></tr>';
             else {
+                const max = data.max_players || 5;
                 rooms.forEach(room => {
                     const count = data.rooms[room];
                     const joinUrl = `${window.location.origin}/?room=${encodeURIComponent(room)}`;
                     const qrApiUrl = `${CONFIG.api.qr}${encodeURIComponent(joinUrl)}`;
                     const row = document.createElement('tr');
                     row.innerHTML = `<td style="vertical-align:middle;"><strong>${room}</strong></td>
-                        <td style="vertical-align:middle;"><span class="badge ${count >= 5 ? 'bg-danger' : 'bg-success'}">${count}/5 Players</span></td>
+                        <td style="vertical-align:middle;"><span class="badge ${count >= max ? 'bg-danger' : 'bg-success'}">${count}/${max} Players</span></td>
                         <td><img alt="QR Code for Room - ${room}" src="${qrApiUrl}" class="img-thumbnail" style="width:80px;height:80px;cursor:pointer;" onclick="window.open('${qrApiUrl.replace('100x100','400x400')}')"></td>`;
                     tbody.appendChild(row);
                 });
+                if (data.total_rooms > rooms.length) tbody.insertAdjacentHTML('beforeend', `<tr><td colspan="3" class="text-center text-muted">+ ${data.total_rooms - rooms.length} more rooms. Join any room by name.</td></tr>`);
             }
             const scoresDiv = document.getElementById('high-scores');
             scoresDiv.innerHTML = '<h3>Top Scores</h3>';
@@ -523,6 +631,8 @@
         });
 
         s.on('game_state', (newState) => {
+            Wire.state(newState);
+            Patch.snapshot(newState);
             UI.refreshGameState(newState);
             bootstrap.Modal.getInstance(document.getElementById('roomModal'))?.hide();
             bootstrap.Modal.getInstance(document.getElementById('qrAuthModal'))?.hide();
@@ -573,10 +683,12 @@
         s.on('game_reset', (state) => {
             UI.updateMessage("Round reset. Ready for a new round.");
             bootstrap.Modal.getInstance(document.getElementById('debriefModal'))?.hide();
+            Wire.state(state);
+            Patch.snapshot(state);
             UI.refreshGameState(state);
         });
 
-        // The RESTORED Time Response Handler
+        // Pushed once a second by the server's room clock
         s.on('time_response', (data) => {
             const timer = document.getElementById("timer");
             if (data.phase === "debrief") timer.innerText = "DEBRIEF:\n" + data.roundTimeRemaining + " sec";
@@ -601,61 +713,77 @@
             Audio.manageOvenSound(isOn); 
         });
 
-        s.on('new_order', (order) => { UI.updateMessage("New Order: " + order.type); State.gameData.customer_orders.push(order); UI.refreshGameState(State.gameData); });
-        s.on('order_fulfilled', (data) => { Audio.play('cash'); UI.updateMessage("Fulfilled: " + data.order_id); const el = document.querySelector(`[data-order-id="${data.order_id}"]`); if (el) el.remove(); });
+        s.on('game_state_patch', (patch) => Patch.apply(patch));
 
-        s.on('game_state_update', (update) => {
-            if (update.customer_orders) State.gameData.customer_orders = update.customer_orders;
-            if (update.pending_orders) State.gameData.pending_orders = update.pending_orders;
-            UI.refreshGameState(State.gameData);
-        });
+        // The events of a batch of actions arrive together; hand each to its usual listener
+        s.on('batched_events', (data) => data.events.forEach(([name, payload]) => s.listeners(name).forEach(fn => fn(payload))));
+        s.on('batch_result', (data) => data.results.forEach(r => { if (r.error) UI.updateMessage("Error: " + r.error); }));
 
-s.on('admin_dashboard_update', (data) => {
-    const tbody = document.getElementById('facilitator-table-body');
-    if (!tbody) return;
-
-    tbody.innerHTML = '';
-
-    // Safely normalise whatever the server sends into an array
-    let roomsArray = [];
-
-    if (Array.isArray(data.rooms)) {
-        roomsArray = data.rooms;
-    } else if (data.rooms && typeof data.rooms === 'object') {
-        // e.g. { "Room A": { phase: "...", ... }, ... }
-        roomsArray = Object.keys(data.rooms).map((roomName) => ({
-            room: roomName,
-            ...data.rooms[roomName]
-        }));
-    }
+        s.on('new_order', (order) => UI.updateMessage("New Order: " + order.type));
+        s.on('order_fulfilled', (data) => { Audio.play('cash'); UI.updateMessage("Fulfilled: " + data.order_id); const el = document.querySelector(`[data-order-id="${data.order_id}"]`); if (el) el.remove(); });
 
-    // If still nothing, show a friendly “no data” row
-    if (!roomsArray.length) {
-        const row = document.createElement('tr');
-        row.innerHTML =
-            '<td colspan="8" class="text-center text-muted">No active rooms yet.</td>';
-        tbody.appendChild(row);
-        return;
-    }
+// One page of rooms; data.next is the page after it, null on the last one
+s.on('admin_dashboard_update', (data) => {
+    State.dashboardRooms = data.rooms || {};
+    State.dashboardPage = data.page || 0;
+    State.dashboardNext = data.next ?? null;
+    State.dashboardClockOffset = data.now - Date.now() / 1000;
+    renderDashboard();
+});
 
-    roomsArray.forEach((room) => {
-        const row = document.createElement('tr');
-        row.innerHTML = `
-            <td class="text-start fw-bold">${room.room}</td>
-            <td>${room.phase ?? '-'}</td>
-            <td>${room.time_left != null ? room.time_left + 's' : '-'}</td>
-            <td>${room.players ?? '-'}</td>
-            <td>${room.completed ?? '-'}</td>
-            <td>${room.wasted ?? '-'}</td>
-            <td>${room.oven ?? '-'}</td>
-            <td>${room.built ?? '-'}</td>
-        `;
-        tbody.appendChild(row);
+// Only the rooms that changed, from every page; null means the room is gone. Rows on this page are
+// updated in place, and the page is fetched again when a room leaves it or, on the first page, when
+// another room has become one of the most recently active.
+s.on('admin_dashboard_diff', (data) => {
+    let refetch = false;
+    Object.entries(data.rooms).forEach(([name, row]) => {
+        if (!(name in State.dashboardRooms)) refetch = refetch || (row && State.dashboardPage === 0);
+        else if (row) State.dashboardRooms[name] = row;
+        else { delete State.dashboardRooms[name]; refetch = true; }
     });
+    State.dashboardClockOffset = data.now - Date.now() / 1000;
+    if (refetch) s.emit('request_admin_dashboard', { page: State.dashboardPage });
+    renderDashboard();
 });
 
     }
 
+    // The page the server sent, most recently active rooms first; time left counts down locally
+    function renderDashboard() {
+        const tbody = document.getElementById('facilitator-table-body');
+        if (!tbody) return;
+        tbody.innerHTML = '';
+
+        const roomsArray = Object.entries(State.dashboardRooms)
+            .map(([room, row]) => ({ room, ...row }))
+            .sort((a, b) => b.active - a.active);
+        document.getElementById('facilitator-page').textContent = `Page ${State.dashboardPage + 1}`;
+        document.getElementById('facilitator-prev').toggleAttribute('disabled', State.dashboardPage === 0);
+        document.getElementById('facilitator-next').toggleAttribute('disabled', State.dashboardNext === null);
+
+        if (!roomsArray.length) {
+            tbody.innerHTML = '<tr><td colspan="8" class="text-center text-muted">No active rooms yet.</td></tr>';
+            return;
+        }
+
+        const now = Date.now() / 1000 + State.dashboardClockOffset;
+        roomsArray.forEach((room) => {
+            const timeLeft = room.ends_at ? Math.max(0, Math.floor(room.ends_at - now)) : 0;
+            const row = document.createElement('tr');
+            row.innerHTML = `
+                <td class="text-start fw-bold">${room.room}</td>
+                <td>${room.phase ?? '-'}</td>
+                <td>${timeLeft}s</td>
+                <td>${room.players ?? '-'}</td>
+                <td>${room.completed ?? '-'}</td>
+                <td>${room.wasted ?? '-'}</td>
+                <td>${room.oven ?? '-'}</td>
+                <td>${room.built ?? '-'}</td>
+            `;
+            tbody.appendChild(row);
+        });
+    }
+
     /* =========================================
        9. INITIALIZATION
        ========================================= */
@@ -665,11 +793,12 @@ s.on('admin_dashboard_update', (data) => {
         const facEl = document.getElementById('facilitatorModal');
         if (facEl) {
             facEl.addEventListener('hidden.bs.modal', () => {
-                // 1. Stop Polling
+                // 1. Stop the updates
                 if (State.dashboardInterval) {
                     clearInterval(State.dashboardInterval);
                     State.dashboardInterval = null;
                 }
+                State.socket.emit('leave_admin_dashboard');
 
                 // 2. Restore Room/Login Modal
                 // We use getOrCreateInstance to ensure it initializes correctly if it was fully disposed
@@ -681,10 +810,7 @@ s.on('admin_dashboard_update', (data) => {
                 roomModal.show();
             });
         }
-        
 
-        // RESTORED: Heartbeat (every 1s) to drive Python logic (orders) and display timers
-        State.heartbeat = setInterval(() => State.socket.emit('time_request'), 1000);
 
         const roomParam = new URLSearchParams(window.location.search).get('room');
         if (roomParam) {
@@ -778,8 +904,8 @@ s.on('admin_dashboard_update', (data) => {
 
 // --- Public Window Functions ---
 
-    window.prepareIngredient = (type) => State.socket.emit('prepare_ingredient', { ingredient_type: type });
-    window.triggerBuild = (sid) => State.socket.emit('build_pizza', { player_sid: sid });
+    window.prepareIngredient = (type) => Game.queueAction('prepare_ingredient', { ingredient_type: type });
+    window.triggerBuild = (sid) => Game.queueAction('build_pizza', { player_sid: sid }, true);
     window.cancelQrJoin = () => { window.location.href = "/"; };
 
     window.openFacilitator = () => {
@@ -793,13 +919,18 @@ s.on('admin_dashboard_update', (data) => {
         const facModal = new bootstrap.Modal(facEl);
         facModal.show();
 
-        // 3. Fetch Data & Start Polling
+        // 3. Fetch the table; the server pushes changes from then on
         fetchSystemHealth();
-        State.socket.emit('request_admin_dashboard');
+        State.dashboardPage = 0;
+        State.socket.emit('request_admin_dashboard', { page: 0 });
         
-        // Clear any existing interval to be safe
+        // Clear any existing interval to be safe. This only redraws the countdowns.
         if (State.dashboardInterval) clearInterval(State.dashboardInterval);
-        State.dashboardInterval = setInterval(() => State.socket.emit('request_admin_dashboard'), 3000);
+        State.dashboardInterval = setInterval(renderDashboard, 1000);
+    };
+
+    window.facilitatorPage = (step) => {
+        State.socket.emit('request_admin_dashboard', { page: Math.max(0, State.dashboardPage + step) });
     };
 
     window.closeFacilitator = () => {